@@ -1,10 +1,27 @@
-class K8sPromptTemplates:
-    """Prompt templates for the Kubernetes cluster manager agent"""
-    
-    @staticmethod
-    def infrastructure_setup_prompt() -> str:
-        """Prompt for infrastructure setup"""
-        return """
+from string import Template
+from typing import Final
+
+# Static prompt text is built once at import time; the parameterized prompts
+# are compiled once as string.Template objects and only substituted per call.
+# Keeping the static text first also keeps the request prefix identical across
+# calls, which is what provider-side prompt caching keys on.
+_SYSTEM_PROMPT: Final[str] = """
+            You are a DevOps expert that specializes in setting up Kubernetes clusters on AWS using Terraform.
+            You need to help users create a bare metal Kubernetes cluster by:
+            1. Creating the necessary infrastructure using Terraform
+            2. Configuring the instances to run Kubernetes
+            3. Setting up the Kubernetes cluster with master and worker nodes
+            
+            Use the available tools to:
+            - Run Terraform commands to set up EC2 instances
+            - Generate scripts for installing Kubernetes components
+            - Use SSH to execute commands on the remote servers
+            - Transfer files using SCP
+            
+            Always think step by step and explain your reasoning.
+            """
+
+_INFRA_PROMPT: Final[str] = """
         I need you to set up the AWS infrastructure for a Kubernetes cluster using Terraform.
         
         First, initialize Terraform in the working directory. Then, create a plan to review the resources 
@@ -22,12 +39,9 @@ class K8sPromptTemplates:
         
         Please execute these steps and keep track of the resources created.
         """
-    
-    @staticmethod
-    def master_setup_prompt(master_ip: str, ssh_key_path: str) -> str:
-        """Prompt for master node setup"""
-        return f"""
-        Now that the infrastructure is ready, I need you to set up the Kubernetes master node on {master_ip}.
+
+_MASTER_TMPL: Final[Template] = Template("""
+        Now that the infrastructure is ready, I need you to set up the Kubernetes master node on ${master_ip}.
         
         First, generate the common setup script that will be used for all nodes. This script should:
         1. Update the system
@@ -52,13 +66,10 @@ class K8sPromptTemplates:
         5. Retrieve the join command for worker nodes
         
         Please execute these steps and report back on the status of the master node.
-        """
-    
-    @staticmethod
-    def worker_setup_prompt(worker_ip: str, ssh_key_path: str, join_command: str) -> str:
-        """Prompt for worker node setup"""
-        return f"""
-        Now that the master node is set up, I need you to set up the Kubernetes worker node on {worker_ip}.
+        """)
+
+_WORKER_TMPL: Final[Template] = Template("""
+        Now that the master node is set up, I need you to set up the Kubernetes worker node on ${worker_ip}.
         
         First, generate the common setup script that will be used for all nodes (if not already done). This script should:
         1. Update the system
@@ -74,17 +85,14 @@ class K8sPromptTemplates:
         
         Here's what you need to do:
         1. Generate the common setup script (if not already done)
-        2. Generate the worker-specific script with the join command: {join_command}
+        2. Generate the worker-specific script with the join command: ${join_command}
         3. Transfer the scripts to the worker node using SCP
         4. Execute the scripts via SSH
         
         Please execute these steps and report back on the status of the worker node.
-        """
-    
-    @staticmethod
-    def cluster_verification_prompt(master_ip: str, ssh_key_path: str) -> str:
-        """Prompt for cluster verification"""
-        return f"""
+        """)
+
+_VERIFICATION_TMPL: Final[Template] = Template("""
         Now that both master and worker nodes are set up, I need you to verify that the Kubernetes cluster is functioning correctly.
         
         Connect to the master node via SSH and run the following commands:
@@ -93,17 +101,14 @@ class K8sPromptTemplates:
         3. kubectl version - to verify the Kubernetes version
         
         Here's what you need to do:
-        1. SSH into the master node {master_ip}
+        1. SSH into the master node ${master_ip}
         2. Run the verification commands
         3. Report back on the status of the cluster
         
         Please execute these steps and confirm that the cluster is functioning correctly.
-        """
-        
-    @staticmethod
-    def cluster_destruction_prompt() -> str:
-        """Prompt for cluster destruction"""
-        return """
+        """)
+
+_DESTRUCTION_PROMPT: Final[str] = """
         I need you to destroy the Kubernetes cluster infrastructure that was created with Terraform.
         
         Run 'terraform destroy' with the auto-approve flag to remove all AWS resources that were created.
@@ -114,4 +119,38 @@ class K8sPromptTemplates:
         3. Verify that all resources have been destroyed
         
         Please execute these steps and confirm that all resources have been destroyed.
-        """
\ No newline at end of file
+        """
+
+
+class K8sPromptTemplates:
+    """Prompt templates for the Kubernetes cluster manager agent"""
+    
+    @staticmethod
+    def system_prompt() -> str:
+        """System prompt shared by every agent invocation"""
+        return _SYSTEM_PROMPT
+    
+    @staticmethod
+    def infrastructure_setup_prompt() -> str:
+        """Prompt for infrastructure setup"""
+        return _INFRA_PROMPT
+    
+    @staticmethod
+    def master_setup_prompt(master_ip: str, ssh_key_path: str) -> str:
+        """Prompt for master node setup"""
+        return _MASTER_TMPL.substitute(master_ip=master_ip, ssh_key_path=ssh_key_path)
+    
+    @staticmethod
+    def worker_setup_prompt(worker_ip: str, ssh_key_path: str, join_command: str) -> str:
+        """Prompt for worker node setup"""
+        return _WORKER_TMPL.substitute(worker_ip=worker_ip, ssh_key_path=ssh_key_path, join_command=join_command)
+    
+    @staticmethod
+    def cluster_verification_prompt(master_ip: str, ssh_key_path: str) -> str:
+        """Prompt for cluster verification"""
+        return _VERIFICATION_TMPL.substitute(master_ip=master_ip, ssh_key_path=ssh_key_path)
+        
+    @staticmethod
+    def cluster_destruction_prompt() -> str:
+        """Prompt for cluster destruction"""
+        return _DESTRUCTION_PROMPT
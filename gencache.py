@@ -0,0 +1,76 @@
+from typing import List, Dict, Any, Optional, Tuple, Callable
+import hashlib
+import re
+import threading
+
+class GenCache:
+    """Cache of agent tool plans for prompts that differ only in placeholder values
+
+    A schema names the placeholders of a prompt template (e.g. "{worker_ip}").
+    The structural key of a prompt is its hash with every placeholder value blanked
+    back to the placeholder, so prompts rendered for different nodes share a key.
+    Stored plans are kept in that abstracted form and re-filled on lookup.
+    """
+
+    def __init__(self):
+        self._schemas: Dict[str, List[str]] = {}
+        self._plans: Dict[str, List[Tuple[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def register_schema(self, template_id: str, placeholders: List[str]) -> None:
+        """Register the placeholders that vary between renderings of a template"""
+        self._schemas[template_id] = list(placeholders)
+
+    def structural_key(self, template_id: str, prompt: str, values: Dict[str, str]) -> Optional[str]:
+        """Hash the prompt skeleton, or return None if the values do not match the schema"""
+        placeholders = self._schemas.get(template_id)
+        if placeholders is None or set(values) != set(placeholders):
+            return None
+        # A missing value (e.g. a node without an address yet) can't be abstracted
+        if not all(isinstance(value, str) and value for value in values.values()):
+            return None
+        skeleton = _abstract(prompt, values)
+        return hashlib.sha256(f"{template_id}\0{skeleton}".encode("utf-8")).hexdigest()
+
+    def lookup(self, template_id: str, prompt: str, values: Dict[str, str]) -> Optional[List[Tuple[str, Any]]]:
+        """Return the cached (tool, tool_input) plan with the given values substituted in"""
+        key = self.structural_key(template_id, prompt, values)
+        if key is None:
+            return None
+        with self._lock:
+            plan = self._plans.get(key)
+        if plan is None:
+            return None
+        return [(tool, _substitute(tool_input, values)) for tool, tool_input in plan]
+
+    def store(self, template_id: str, prompt: str, values: Dict[str, str], steps: List[Tuple[str, Any]]) -> None:
+        """Record the (tool, tool_input) plan the agent used for this prompt"""
+        key = self.structural_key(template_id, prompt, values)
+        if key is None or not steps:
+            return
+        plan = [(tool, _abstract(tool_input, values)) for tool, tool_input in steps]
+        with self._lock:
+            self._plans[key] = plan
+
+def _map_strings(obj: Any, replace: Callable[[str], str]) -> Any:
+    """Apply replace to every string in obj, recursing into dicts, lists and tuples"""
+    if isinstance(obj, str):
+        return replace(obj)
+    if isinstance(obj, dict):
+        return {key: _map_strings(value, replace) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_map_strings(item, replace) for item in obj)
+    return obj
+
+def _abstract(obj: Any, values: Dict[str, str]) -> Any:
+    """Replace concrete values with their placeholders, matching whole tokens only"""
+    # 54.1.2.3 must not match inside 54.1.2.34, so a value can't touch a word character or dot
+    placeholders = {value: placeholder for placeholder, value in values.items()}
+    alternatives = "|".join(re.escape(value) for value in sorted(placeholders, key=len, reverse=True))
+    pattern = re.compile(rf"(?<![\w.])(?:{alternatives})(?![\w.])")
+    return _map_strings(obj, lambda text: pattern.sub(lambda match: placeholders[match.group(0)], text))
+
+def _substitute(obj: Any, values: Dict[str, str]) -> Any:
+    """Replace placeholders with their concrete values in a single pass"""
+    pattern = re.compile("|".join(re.escape(placeholder) for placeholder in values))
+    return _map_strings(obj, lambda text: pattern.sub(lambda match: values[match.group(0)], text))
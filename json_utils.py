@@ -0,0 +1,20 @@
+import json
+from typing import Any, Union
+
+# orjson is optional; fall back to the standard library when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj: Any) -> str:
+    """Serialize JSON with two-space indentation, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
@@ -1,12 +1,26 @@
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain_community.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.schema import AgentAction, SystemMessage
+from langchain.schema.runnable import RunnablePassthrough
 from langchain.tools import BaseTool
-from typing import List, Dict, Any, Optional, Tuple
+from langchain_core.utils.function_calling import convert_to_openai_tool
+import httpx
+import openai
+from typing import List, Dict, Any, Optional, Tuple, Final
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import os
 import json
 import time
+import asyncio
+import hashlib
+import importlib.util
+from collections import deque
+from uuid import UUID
 
 # Import our custom tools
 from terraform_tools import (
@@ -14,110 +28,84 @@ from terraform_tools import (
     TerraformPlanTool, 
     TerraformApplyTool, 
     TerraformOutputTool,
-    TerraformDestroyTool
+    TerraformDestroyTool,
+    BatchedAWSOutputTool
 )
 from ssh_tools import (
     SSHConnectionTool,
     SCPTransferTool,
-    ScriptGeneratorTool
+    ScriptGeneratorTool,
+    close_connections
 )
+from agent_prompts import K8sPromptTemplates
+from llm_cache import CachedChatModel, FileBackend
+from gencache import GenCache
 
-class K8sClusterManager:
-    def __init__(self, 
-                 api_key: str,
-                 model_name: str = "gpt-4",
-                 temperature: float = 0.0,
-                 verbose: bool = True):
-        """Initialize the Kubernetes Cluster Manager Agent"""
-        self.api_key = api_key
-        self.model_name = model_name
-        self.temperature = temperature
-        self.verbose = verbose
-        
-        # Set up model
-        self.llm = ChatOpenAI(
-            openai_api_key=api_key, 
-            model=model_name, 
-            temperature=temperature
-        )
-        
-        # Initialize tools
-        self.tools = self._setup_tools()
-        
-        # Set up agent
-        self.agent = self._setup_agent()
-        
-        # Working directory for artifacts
-        self.working_dir = "./k8s_setup"
-        os.makedirs(self.working_dir, exist_ok=True)
-        os.makedirs(f"{self.working_dir}/terraform", exist_ok=True)
-        os.makedirs(f"{self.working_dir}/scripts", exist_ok=True)
-        
-    def _setup_tools(self) -> List[BaseTool]:
-        """Set up tools for the agent"""
-        return [
-            TerraformInitTool(),
-            TerraformPlanTool(),
-            TerraformApplyTool(),
-            TerraformOutputTool(),
-            TerraformDestroyTool(),
-            SSHConnectionTool(),
-            SCPTransferTool(),
-            ScriptGeneratorTool()
-        ]
-        
-    def _setup_agent(self) -> AgentExecutor:
-        """Set up LangChain agent"""
-        system_message = SystemMessage(
-            content="""
-            You are a DevOps expert that specializes in setting up Kubernetes clusters on AWS using Terraform.
-            You need to help users create a bare metal Kubernetes cluster by:
-            1. Creating the necessary infrastructure using Terraform
-            2. Configuring the instances to run Kubernetes
-            3. Setting up the Kubernetes cluster with master and worker nodes
-            
-            Use the available tools to:
-            - Run Terraform commands to set up EC2 instances
-            - Generate scripts for installing Kubernetes components
-            - Use SSH to execute commands on the remote servers
-            - Transfer files using SCP
-            
-            Always think step by step and explain your reasoning.
-            """
-        )
-        
-        agent = create_openai_tools_agent(
-            self.llm,
-            self.tools,
-            system_message
-        )
+# Upper bound on worker nodes configured at the same time
+MAX_WORKER_CONCURRENCY = 8
+
+# Upper bound on LLM round-trips per agent task
+MAX_AGENT_ITERATIONS = 12
+
+# Connection pool shared by every OpenAI API call the manager makes; HTTP/2
+# needs the optional h2 package
+HTTP_CLIENT_OPTIONS = {
+    "http2": importlib.util.find_spec("h2") is not None,
+    "limits": httpx.Limits(max_keepalive_connections=20, max_connections=50)
+}
+
+# Prefixes our tools use when reporting a failed operation
+_TOOL_ERROR_PREFIXES = (
+    "Error",
+    "SSH error",
+    "SCP error",
+    "Command failed",
+    "Script generation error",
+    "Unknown script type"
+)
+
+def _is_tool_error(observation: Any) -> bool:
+    """Check whether a tool observation reports a failure"""
+    return isinstance(observation, str) and observation.startswith(_TOOL_ERROR_PREFIXES)
+
+# Output AgentExecutor returns when it gives up at max_iterations or max_execution_time
+_AGENT_STOPPED_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+def _completed_cleanly(result: Dict[str, Any]) -> bool:
+    """Check that the agent finished on its own and none of its tool calls failed"""
+    if result.get("output") == _AGENT_STOPPED_OUTPUT:
+        return False
+    return not any(_is_tool_error(observation) for _, observation in result.get("intermediate_steps", []))
+
+class EarlyStop(Exception):
+    """Raised when the agent keeps repeating the same tool call"""
+
+class LoopGuard(BaseCallbackHandler):
+    """Stop the agent when the same tool call returns the same output twice in a row
+    
+    Each (tool, input, output) triple is hashed; a repeat within the last few
+    tool calls means the agent is looping without making progress.
+    """
+    
+    raise_error = True
+    
+    def __init__(self, window: int = 3):
+        self._recent = deque(maxlen=window)
+        self._pending: Dict[UUID, str] = {}
         
-        return AgentExecutor.from_agent_and_tools(
-            agent=agent,
-            tools=self.tools,
-            verbose=self.verbose,
-            max_iterations=15
-        )
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._pending[run_id] = f"{serialized.get('name')}\0{input_str}"
         
-    def create_terraform_files(self, config: Dict[str, Any]) -> None:
-        """Create Terraform files based on user config"""
-        # Create main.tf
-        with open(os.path.join(self.working_dir, "terraform", "main.tf"), "w") as f:
-            f.write(self._generate_main_tf())
-            
-        # Create variables.tf
-        with open(os.path.join(self.working_dir, "terraform", "variables.tf"), "w") as f:
-            f.write(self._generate_variables_tf())
-            
-        # Create terraform.tfvars
-        with open(os.path.join(self.working_dir, "terraform", "terraform.tfvars"), "w") as f:
-            f.write(self._generate_tfvars(config))
-    
-    def _generate_main_tf(self) -> str:
-        """Generate main.tf content"""
-        # This would be the content of your main.tf file
-        # You can read this from a template file or generate it dynamically
-        return """
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        call = self._pending.pop(run_id, "")
+        digest = hashlib.sha256(f"{call}\0{output}".encode("utf-8")).hexdigest()
+        if digest in self._recent:
+            tool_name = call.split("\0", 1)[0]
+            raise EarlyStop(f"Agent is looping: {tool_name} repeated with the same input and output")
+        self._recent.append(digest)
+
+# Terraform configuration shared by every cluster; per-cluster values go in terraform.tfvars
+_MAIN_TF: Final[str] = """
 # Provider configuration
 provider "aws" {
   region = var.aws_region
@@ -285,10 +273,8 @@ output "kubernetes_api_endpoint" {
   value = "https://${aws_instance.k8s_master[0].public_ip}:6443"
 }
 """
-    
-    def _generate_variables_tf(self) -> str:
-        """Generate variables.tf content"""
-        return """
+
+_VARIABLES_TF: Final[str] = """
 variable "aws_region" {
   description = "AWS region where the Kubernetes cluster will be provisioned"
   type        = string
@@ -385,26 +371,264 @@ variable "service_cidr" {
   default     = "10.96.0.0/12"
 }
 """
+
+def _format_tfvar(key: str, value: Any) -> str:
+    return f'{key} = {value}'
+
+def _format_tfvar_list(key: str, value: List[Any]) -> str:
+    if all(isinstance(item, str) for item in value):
+        formatted_list = '", "'.join(value)
+        return f'{key} = ["{formatted_list}"]'
+    formatted_list = ', '.join(map(str, value))
+    return f'{key} = [{formatted_list}]'
+
+# tfvars line formatters keyed by exact value type; anything else is written as-is
+_TFVARS_FORMATTERS = {
+    str: lambda key, value: f'{key} = "{value}"',
+    bool: lambda key, value: f'{key} = {str(value).lower()}',
+    int: _format_tfvar,
+    float: _format_tfvar,
+    list: _format_tfvar_list
+}
+
+class K8sClusterManager:
+    def __init__(self, 
+                 api_key: str,
+                 model_name: str = "gpt-4",
+                 temperature: float = 0.0,
+                 verbose: bool = True):
+        """Initialize the Kubernetes Cluster Manager Agent"""
+        self.api_key = api_key
+        self.model_name = model_name
+        self.temperature = temperature
+        self.verbose = verbose
+        
+        # Working directory for artifacts
+        self.working_dir = "./k8s_setup"
+        self.terraform_dir = f"{self.working_dir}/terraform"
+        self.scripts_dir = f"{self.working_dir}/scripts"
+        self.main_tf_path = os.path.join(self.terraform_dir, "main.tf")
+        self.variables_tf_path = os.path.join(self.terraform_dir, "variables.tf")
+        self.tfvars_path = os.path.join(self.terraform_dir, "terraform.tfvars")
+        self.tfstate_path = os.path.join(self.terraform_dir, "terraform.tfstate")
+        self.apply_hash_path = os.path.join(self.working_dir, ".last_apply.hash")
+        
+        # Initialize tools
+        self.tools = self._setup_tools()
+        self._tools_by_name = {tool.name: tool for tool in self.tools}
+        # Convert the tools to OpenAI function schemas once; the agent and the
+        # prompt-module id both reuse them
+        self._tool_schemas = [convert_to_openai_tool(tool) for tool in self.tools]
+        
+        # Endpoint settings resolved from the environment the same way ChatOpenAI does
+        self.openai_api_base = os.environ.get("OPENAI_API_BASE") or None
+        self.openai_organization = os.environ.get("OPENAI_ORG_ID") or os.environ.get("OPENAI_ORGANIZATION")
+        self.openai_proxy = os.environ.get("OPENAI_PROXY") or None
+        
+        # Set up model, reusing one pool of HTTP connections for every sync API call;
+        # async calls get a pool per event loop, see _configure_workers
+        self.http_client = httpx.Client(**self._http_client_options())
+        self.async_http_client: Optional[httpx.AsyncClient] = None
+        self.llm = self._setup_llm()
+        self._bound_llm = self.llm.bind(tools=self._tool_schemas)
+        
+        # Worker prompts differ only in node IP and join command, so the tool
+        # plan used for one worker can be replayed for the next
+        self.gencache = GenCache()
+        self.gencache.register_schema("worker_setup", ["{worker_ip}", "{join_command}"])
+        
+        # Set up agent
+        self.agent = self._setup_agent()
+        
+    def _http_client_options(self) -> Dict[str, Any]:
+        """Options for the pooled httpx clients, routed through OPENAI_PROXY when it is set"""
+        if self.openai_proxy:
+            return {**HTTP_CLIENT_OPTIONS, "proxy": self.openai_proxy}
+        return dict(HTTP_CLIENT_OPTIONS)
+        
+    def _openai_client_kwargs(self) -> Dict[str, Any]:
+        """Arguments for the OpenAI SDK clients, matching what ChatOpenAI would pass"""
+        return {
+            "api_key": self.api_key,
+            "organization": self.openai_organization,
+            "base_url": self.openai_api_base
+        }
+        
+    def _setup_llm(self) -> ChatOpenAI:
+        """Set up the chat model, caching deterministic responses on disk when K8S_AGENT_LLM_CACHE=1"""
+        # ChatOpenAI would hand a single http_client to both the sync and async
+        # SDK clients, so the sync client is built here with its own pooled transport
+        llm_kwargs = {
+            "openai_api_key": self.api_key,
+            "openai_api_base": self.openai_api_base,
+            "openai_organization": self.openai_organization,
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "model_kwargs": self._prompt_module_kwargs(),
+            "client": openai.OpenAI(**self._openai_client_kwargs(), http_client=self.http_client).chat.completions
+        }
+        
+        if os.environ.get("K8S_AGENT_LLM_CACHE") == "1":
+            return CachedChatModel(
+                **llm_kwargs,
+                backend=FileBackend(os.path.join(self.working_dir, ".llm_cache"))
+            )
+            
+        return ChatOpenAI(**llm_kwargs)
+        
+    def _prompt_module_kwargs(self) -> Dict[str, Any]:
+        """Request fields identifying the static system prompt and tool schemas as a reusable prompt module
+        
+        Self-hosted backends pointed to by OPENAI_BASE_URL (e.g. vLLM) can keep the KV
+        states of that prefix across agent iterations. The hosted OpenAI API caches
+        prefixes on its own, so nothing extra is sent there.
+        """
+        base_url = self.openai_api_base or os.environ.get("OPENAI_BASE_URL", "")
+        if not base_url or "api.openai.com" in base_url:
+            return {}
+            
+        prompt_module = json.dumps({
+            "system": K8sPromptTemplates.system_prompt(),
+            "tools": self._tool_schemas
+        }, sort_keys=True)
+        prompt_module_id = hashlib.sha256(prompt_module.encode("utf-8")).hexdigest()
+        return {"extra_body": {"prompt_module_id": prompt_module_id}}
+        
+    def _setup_tools(self) -> List[BaseTool]:
+        """Set up tools for the agent"""
+        return [
+            TerraformInitTool(),
+            TerraformPlanTool(),
+            TerraformApplyTool(),
+            BatchedAWSOutputTool(),
+            TerraformOutputTool(),
+            TerraformDestroyTool(),
+            SSHConnectionTool(),
+            SCPTransferTool(),
+            ScriptGeneratorTool()
+        ]
+        
+    def _setup_agent(self) -> AgentExecutor:
+        """Set up LangChain agent"""
+        # The system message is static and comes first so the request prefix
+        # stays identical across invocations and can be served from the
+        # provider's prompt cache; only the human input varies per call.
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=K8sPromptTemplates.system_prompt()),
+            ("human", "{input}"),
+            MessagesPlaceholder(variable_name="agent_scratchpad")
+        ])
+        
+        # Same pipeline create_openai_tools_agent builds, but with the
+        # precomputed tool schemas already bound to the model
+        agent = (
+            RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_to_openai_tool_messages(x["intermediate_steps"])
+            )
+            | prompt
+            | self._bound_llm
+            | OpenAIToolsAgentOutputParser()
+        )
+        
+        return AgentExecutor.from_agent_and_tools(
+            agent=agent,
+            tools=self.tools,
+            verbose=self.verbose,
+            max_iterations=MAX_AGENT_ITERATIONS,
+            return_intermediate_steps=True
+        )
+        
+    def create_terraform_files(self, config: Dict[str, Any]) -> None:
+        """Create Terraform files based on user config"""
+        # Working directories are only needed once we generate artifacts
+        Path(self.terraform_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.scripts_dir).mkdir(parents=True, exist_ok=True)
+        Path(os.environ["TF_PLUGIN_CACHE_DIR"]).mkdir(parents=True, exist_ok=True)
+        
+        files = [
+            (self.main_tf_path, self._generate_main_tf()),
+            (self.variables_tf_path, self._generate_variables_tf()),
+            (self.tfvars_path, self._generate_tfvars(config))
+        ]
+        
+        # The files are independent, so write them in parallel
+        with ThreadPoolExecutor(max_workers=len(files)) as executor:
+            list(executor.map(lambda file: Path(file[0]).write_text(file[1]), files))
+    
+    def _generate_main_tf(self) -> str:
+        """Generate main.tf content"""
+        return _MAIN_TF
+    
+    def _generate_variables_tf(self) -> str:
+        """Generate variables.tf content"""
+        return _VARIABLES_TF
     
     def _generate_tfvars(self, config: Dict[str, Any]) -> str:
         """Generate terraform.tfvars content based on user config"""
-        tfvars = ""
-        
-        # Add user configuration values to tfvars
-        for key, value in config.items():
-            if isinstance(value, str):
-                tfvars += f'{key} = "{value}"\n'
-            elif isinstance(value, list):
-                if all(isinstance(item, str) for item in value):
-                    formatted_list = '", "'.join(value)
-                    tfvars += f'{key} = ["{formatted_list}"]\n'
-                else:
-                    formatted_list = ', '.join(map(str, value))
-                    tfvars += f'{key} = [{formatted_list}]\n'
-            else:
-                tfvars += f'{key} = {value}\n'
-                
-        return tfvars
+        return "".join(
+            f"{_TFVARS_FORMATTERS.get(type(value), _format_tfvar)(key, value)}\n"
+            for key, value in config.items()
+        )
+        
+    def _terraform_fingerprint(self) -> Optional[str]:
+        """Hash the Terraform files and state serial, or return None if there is no state yet"""
+        try:
+            with open(self.tfstate_path, "r") as f:
+                serial = json.load(f).get("serial")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+            
+        digest = hashlib.sha256()
+        for path in (self.main_tf_path, self.variables_tf_path, self.tfvars_path):
+            digest.update(Path(path).read_bytes())
+        digest.update(str(serial).encode("utf-8"))
+        return digest.hexdigest()
+        
+    def _infrastructure_unchanged(self) -> bool:
+        """Check whether the Terraform files and state match the last successful apply"""
+        fingerprint = self._terraform_fingerprint()
+        if fingerprint is None:
+            return False
+        try:
+            return Path(self.apply_hash_path).read_text().strip() == fingerprint
+        except FileNotFoundError:
+            return False
+            
+    def _record_apply(self) -> None:
+        """Remember the fingerprint of a successful apply so the next run can skip planning"""
+        fingerprint = self._terraform_fingerprint()
+        if fingerprint is not None:
+            Path(self.apply_hash_path).write_text(fingerprint)
+        
+    def _reapply_infrastructure(self) -> Optional[Dict[str, Any]]:
+        """Apply the unchanged configuration directly, or return None if the full setup has to run"""
+        tool_input = {"workspace_dir": self.terraform_dir, "auto_approve": True, "plan_file": None, "refresh": False}
+        observation = self._tools_by_name["terraform_apply"].run(tool_input)
+        if not observation.startswith("Terraform apply successful"):
+            # The recorded apply no longer holds, so don't take this path again
+            Path(self.apply_hash_path).unlink(missing_ok=True)
+            return None
+            
+        self._record_apply()
+        return {
+            "input": "Reapply unchanged Terraform configuration",
+            "output": observation,
+            "intermediate_steps": [(AgentAction("terraform_apply", tool_input, ""), observation)]
+        }
+        
+    @staticmethod
+    def _apply_succeeded(result: Dict[str, Any]) -> bool:
+        """Check whether an agent run included a successful terraform apply"""
+        return any(
+            action.tool == "terraform_apply" and str(observation).startswith("Terraform apply successful")
+            for action, observation in result.get("intermediate_steps", [])
+        )
+        
+    @staticmethod
+    def _task_input(prompt: str, details: Dict[str, Any]) -> str:
+        """Append run-specific details after a static prompt so the prompt stays a cacheable prefix"""
+        lines = "\n".join(f"- {key}: {value}" for key, value in details.items())
+        return f"{prompt}\nCluster details:\n{lines}\n"
         
     def setup_kubernetes_cluster(self, config: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -424,32 +648,68 @@ variable "service_cidr" {
         try:
             # Create Terraform files
             self.create_terraform_files(config)
+            ssh_key_path = config.get('ssh_private_key_path', '~/.ssh/id_rsa')
+            node_details = {
+                "SSH private key": ssh_key_path,
+                "Scripts directory": self.scripts_dir
+            }
             
-            # Execute agent to set up cluster
-            result = self.agent.invoke({
-                "input": f"""
-                I want to set up a Kubernetes cluster with {config.get('master_count', 1)} master nodes 
-                and {config.get('worker_count', 2)} worker nodes in AWS region {config.get('aws_region', 'us-east-1')}.
-                
-                I have already created the Terraform files in {self.working_dir}/terraform.
-                
-                Please perform the following steps:
-                1. Initialize Terraform
-                2. Create an execution plan
-                3. Apply the Terraform configuration to create the infrastructure
-                4. Generate the necessary scripts for setting up the Kubernetes cluster
-                5. Configure the master node(s)
-                6. Configure the worker nodes
-                7. Verify the cluster is properly set up
-                
-                I'll be using the SSH key at {config.get('ssh_private_key_path', '~/.ssh/id_rsa')} for accessing the instances.
-                """
-            })
+            # Provision the infrastructure, skipping the agent and the plan if nothing
+            # changed since the last apply
+            infrastructure_result = self._reapply_infrastructure() if self._infrastructure_unchanged() else None
+            if infrastructure_result is None:
+                infrastructure_result = self._run_agent(
+                    self._task_input(K8sPromptTemplates.infrastructure_setup_prompt(), {
+                        "Master nodes": config.get('master_count', 1),
+                        "Worker nodes": config.get('worker_count', 2),
+                        "AWS region": config.get('aws_region', 'us-east-1'),
+                        "Terraform files": self.terraform_dir
+                    })
+                )
+                if self._apply_succeeded(infrastructure_result):
+                    self._record_apply()
+            node_ips = self._get_node_ips(config)
+            master_ips = node_ips.get("master_public_ips") or []
+            worker_ips = node_ips.get("worker_public_ips") or []
+            if not master_ips:
+                raise RuntimeError("Terraform outputs do not contain any master node IPs")
+            master_ip = master_ips[0]
+            
+            # Configure the master node and fetch the join command it generated
+            master_result = self._run_agent(
+                self._task_input(K8sPromptTemplates.master_setup_prompt(master_ip, ssh_key_path), node_details)
+            )
+            join_command = self._get_join_command(master_ip, ssh_key_path)
+            
+            # Configure the worker nodes
+            worker_results = asyncio.run(self._configure_workers(worker_ips, join_command, ssh_key_path))
+            
+            # Verify the cluster
+            verification_result = self._run_agent(
+                self._task_input(K8sPromptTemplates.cluster_verification_prompt(master_ip, ssh_key_path), node_details)
+            )
             
             return {
                 "success": True,
                 "message": "Kubernetes cluster setup completed successfully",
-                "agent_output": result
+                "cluster_info": {
+                    "master_ips": master_ips,
+                    "worker_ips": worker_ips,
+                    "kubernetes_api_endpoint": node_ips.get("kubernetes_api_endpoint")
+                },
+                "agent_output": {
+                    "infrastructure": infrastructure_result,
+                    "master": master_result,
+                    "workers": worker_results,
+                    "verification": verification_result
+                }
+            }
+            
+        except EarlyStop as e:
+            return {
+                "success": False,
+                "message": f"Stopped setting up Kubernetes cluster: {str(e)}",
+                "error": str(e)
             }
             
         except Exception as e:
@@ -458,16 +718,119 @@ variable "service_cidr" {
                 "message": f"Error setting up Kubernetes cluster: {str(e)}",
                 "error": str(e)
             }
+        finally:
+            # Node setup is done, release the shared SSH connections
+            close_connections()
     
+    def _run_agent(self, task: str) -> Dict[str, Any]:
+        """Run the agent on a single task"""
+        # Callbacks passed at invoke time reach the tool runs; each task gets a fresh guard
+        return self.agent.invoke({"input": task}, config={"callbacks": [LoopGuard()]})
+        
+    async def _arun_agent(self, task: str) -> Dict[str, Any]:
+        """Run the agent on a single task asynchronously"""
+        return await self.agent.ainvoke({"input": task}, config={"callbacks": [LoopGuard()]})
+        
+    def _get_node_ips(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Read node IP addresses from AWS in one call, falling back to the Terraform outputs"""
+        raw_outputs = self._tools_by_name["aws_cluster_outputs"].run({
+            "cluster_name": config.get('cluster_name', 'k8s-cluster'),
+            "aws_region": config.get('aws_region', 'us-east-1')
+        })
+        # Nodes that aren't running with a public address yet are left out by AWS, so fall
+        # back to Terraform unless every configured node was found
+        if _is_tool_error(raw_outputs) or not self._all_nodes_found(json.loads(raw_outputs), config):
+            raw_outputs = self._tools_by_name["terraform_output"].run({"workspace_dir": self.terraform_dir})
+            
+        try:
+            outputs = json.loads(raw_outputs)
+        except json.JSONDecodeError:
+            raise RuntimeError(f"Could not read Terraform outputs: {raw_outputs}")
+        return {name: output.get("value") for name, output in outputs.items()}
+        
+    @staticmethod
+    def _all_nodes_found(outputs: Dict[str, Any], config: Dict[str, Any]) -> bool:
+        """Check that the outputs list an address for every configured master and worker"""
+        masters = outputs["master_public_ips"]["value"]
+        workers = outputs["worker_public_ips"]["value"]
+        return bool(masters) and len(masters) >= config.get('master_count', 1) and len(workers) >= config.get('worker_count', 2)
+        
+    def _get_join_command(self, master_ip: str, ssh_key_path: str) -> str:
+        """Read the worker join command written by the master setup script"""
+        result = self._tools_by_name["ssh_execute"].run({
+            "host": master_ip,
+            "key_path": ssh_key_path,
+            "command": "sudo cat /root/k8s_join_command.sh"
+        })
+        prefix = "Command executed successfully:\n"
+        if not result.startswith(prefix):
+            raise RuntimeError(f"Could not retrieve join command from master node: {result}")
+        return result[len(prefix):].strip()
+        
+    async def _configure_workers(self, worker_ips: List[str], join_command: str, ssh_key_path: str) -> List[Dict[str, Any]]:
+        """Configure worker nodes concurrently"""
+        if not worker_ips:
+            return []
+            
+        # Pooled async connections belong to the event loop that opened them, and each
+        # asyncio.run() has its own loop, so open a pool for this loop and close it after
+        self.async_http_client = httpx.AsyncClient(**self._http_client_options())
+        self.llm.async_client = openai.AsyncOpenAI(
+            **self._openai_client_kwargs(), http_client=self.async_http_client
+        ).chat.completions
+        try:
+            # Every worker starts right away; those that start after a plan was cached replay it
+            semaphore = asyncio.Semaphore(min(len(worker_ips), MAX_WORKER_CONCURRENCY))
+            
+            async def configure(worker_ip: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self._configure_worker(worker_ip, join_command, ssh_key_path)
+                    
+            return await asyncio.gather(*(configure(worker_ip) for worker_ip in worker_ips))
+        finally:
+            await self.async_http_client.aclose()
+        
+    async def _configure_worker(self, worker_ip: str, join_command: str, ssh_key_path: str) -> Dict[str, Any]:
+        """Configure a worker node, replaying the tool plan of an earlier worker when one is cached"""
+        task = self._task_input(
+            K8sPromptTemplates.worker_setup_prompt(worker_ip, ssh_key_path, join_command),
+            {"SSH private key": ssh_key_path, "Scripts directory": self.scripts_dir}
+        )
+        values = {"{worker_ip}": worker_ip, "{join_command}": join_command}
+        
+        plan = self.gencache.lookup("worker_setup", task, values)
+        if plan is not None:
+            steps = []
+            for tool_name, tool_input in plan:
+                observation = await self._tools_by_name[tool_name].arun(tool_input)
+                steps.append(((tool_name, tool_input), observation))
+                if _is_tool_error(observation):
+                    break
+            else:
+                return {
+                    "input": task,
+                    "output": f"Worker node {worker_ip} configured by replaying {len(plan)} cached steps",
+                    "intermediate_steps": steps
+                }
+            # The replayed plan failed on this node, let the agent take over
+            
+        result = await self._arun_agent(task)
+        # Only a run that worked end to end is a plan worth replaying on other workers
+        if _completed_cleanly(result):
+            self.gencache.store("worker_setup", task, values, [
+                (action.tool, action.tool_input)
+                for action, observation in result.get("intermediate_steps", [])
+            ])
+        return result
+        
     def destroy_cluster(self) -> Dict[str, Any]:
         """Destroy the Kubernetes cluster"""
         try:
-            result = self.agent.invoke({
-                "input": f"""
-                Please destroy the Kubernetes cluster that was created.
-                Run terraform destroy with auto-approve to remove all resources.
-                """
-            })
+            result = self._run_agent(
+                self._task_input(K8sPromptTemplates.cluster_destruction_prompt(), {
+                    "Terraform files": self.terraform_dir
+                })
+            )
             
             return {
                 "success": True,
@@ -475,9 +838,18 @@ variable "service_cidr" {
                 "agent_output": result
             }
             
+        except EarlyStop as e:
+            return {
+                "success": False,
+                "message": f"Stopped destroying Kubernetes cluster: {str(e)}",
+                "error": str(e)
+            }
+            
         except Exception as e:
             return {
                 "success": False,
                 "message": f"Error destroying Kubernetes cluster: {str(e)}",
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+        finally:
+            close_connections()
\ No newline at end of file
@@ -0,0 +1,219 @@
+from langchain_community.chat_models import ChatOpenAI
+from langchain.schema import BaseMessage
+from langchain.schema.messages import AIMessage, AIMessageChunk, message_to_dict, messages_from_dict
+from langchain.schema.output import ChatGeneration, ChatGenerationChunk, ChatResult
+from collections import OrderedDict
+from typing import Protocol, List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Cached responses expire after a day by default
+DEFAULT_TTL = 86400
+
+class CacheBackend(Protocol):
+    """Storage interface for cached LLM responses"""
+
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ...
+
+class MemoryBackend:
+    """In-process LRU cache backend"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class FileBackend:
+    """On-disk cache backend storing one JSON file per key
+
+    Values must be JSON-serializable. Entries are plain data rather than pickles, so
+    a file dropped into the cache directory can't run code in the agent process.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                expires_at, value = json.load(f)
+        except (FileNotFoundError, ValueError, TypeError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        expires_at = time.time() + ttl if ttl else None
+        # Write to a temp file first so concurrent readers never see a partial entry
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([expires_at, value], f)
+        os.replace(tmp_path, self._path(key))
+
+def cache_key(model: str,
+              messages: List[BaseMessage],
+              temperature: float,
+              tools: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+    """Hash a chat request into a cache key, or return None if the request is not deterministic"""
+    if temperature > 0:
+        return None
+
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [
+            {"type": m.type, "content": m.content, "additional_kwargs": m.additional_kwargs}
+            for m in messages
+        ],
+        "tools": tools or []
+    }
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+class CachedChatModel(ChatOpenAI):
+    """ChatOpenAI that serves repeated deterministic requests from a cache backend"""
+
+    backend: Any = None
+    ttl: int = DEFAULT_TTL
+
+    def _cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Optional[str]:
+        if self.backend is None or stop:
+            return None
+        return cache_key(self.model_name, messages, self.temperature, kwargs.get("tools"))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        key = self._cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                return _load_result(cached)
+
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        if key is not None:
+            self.backend.set(key, _dump_result(result), ttl=self.ttl)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        key = self._cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                return _load_result(cached)
+
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        if key is not None:
+            self.backend.set(key, _dump_result(result), ttl=self.ttl)
+        return result
+
+    # AgentExecutor streams the model by default, which goes through _stream rather than _generate
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                chunk = _cached_chunk(_load_result(cached))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                return
+
+        final = None
+        for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            final = chunk if final is None else final + chunk
+            yield chunk
+
+        if key is not None and final is not None:
+            self.backend.set(key, _dump_result(_chunk_result(final)), ttl=self.ttl)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                chunk = _cached_chunk(_load_result(cached))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                return
+
+        final = None
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            final = chunk if final is None else final + chunk
+            yield chunk
+
+        if key is not None and final is not None:
+            self.backend.set(key, _dump_result(_chunk_result(final)), ttl=self.ttl)
+
+def _cached_chunk(result: ChatResult) -> ChatGenerationChunk:
+    """Replay a cached result as a single stream chunk"""
+    generation = result.generations[0]
+    message = generation.message
+    return ChatGenerationChunk(
+        message=AIMessageChunk(content=message.content, additional_kwargs=message.additional_kwargs),
+        generation_info=generation.generation_info
+    )
+
+def _chunk_result(chunk: ChatGenerationChunk) -> ChatResult:
+    """Turn the accumulated stream into the same ChatResult shape _generate caches"""
+    message = AIMessage(content=chunk.message.content, additional_kwargs=chunk.message.additional_kwargs)
+    return ChatResult(generations=[ChatGeneration(message=message, generation_info=chunk.generation_info)])
+
+def _dump_result(result: ChatResult) -> Dict[str, Any]:
+    """Plain JSON data for a ChatResult, as stored in the cache backends"""
+    return {
+        "generations": [
+            {"message": message_to_dict(generation.message), "generation_info": generation.generation_info}
+            for generation in result.generations
+        ],
+        "llm_output": result.llm_output
+    }
+
+def _load_result(data: Dict[str, Any]) -> ChatResult:
+    """Rebuild a ChatResult from the data _dump_result stored"""
+    generations = [
+        ChatGeneration(message=messages_from_dict([generation["message"]])[0], generation_info=generation["generation_info"])
+        for generation in data["generations"]
+    ]
+    return ChatResult(generations=generations, llm_output=data.get("llm_output"))
@@ -1,9 +1,34 @@
 import os
+import copy
 import argparse
 import json
-from typing import Dict, Any
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping
 
-from k8s_manager import K8sClusterManager
+from json_utils import json_loads, json_dumps
+
+# Default configuration, serialized once at import time
+_DEFAULT_CONFIG: Final[Mapping[str, Any]] = MappingProxyType({
+    "cluster_name": "k8s-cluster",
+    "aws_region": "us-east-1",
+    "availability_zones": ["us-east-1a", "us-east-1b"],
+    "vpc_cidr": "10.0.0.0/16",
+    "subnet_count": 2,
+    "master_count": 1,
+    "worker_count": 2,
+    "master_instance_type": "t3.medium",
+    "worker_instance_type": "t3.large",
+    "master_volume_size": 50,
+    "worker_volume_size": 100,
+    "ssh_public_key_path": "./.ssh/id_rsa.pub",
+    "ssh_private_key_path": "./.ssh/id_rsa",
+    "kubernetes_version": "1.28.2",
+    "pod_network_cidr": "10.244.0.0/16",
+    "service_cidr": "10.96.0.0/12"
+})
+_DEFAULT_CONFIG_BYTES: Final[bytes] = json_dumps(dict(_DEFAULT_CONFIG)).encode("utf-8")
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -20,8 +45,9 @@ def parse_arguments():
 def load_config(config_path: str) -> Dict[str, Any]:
     """Load configuration from JSON file"""
     try:
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        # Callers may modify the config, so hand out a copy of the cached parse
+        mtime_ns = os.stat(config_path).st_mtime_ns
+        return copy.deepcopy(_load_config_file(config_path, mtime_ns))
     except FileNotFoundError:
         print(f"Configuration file {config_path} not found. Creating a default configuration.")
         return create_default_config(config_path)
@@ -29,33 +55,19 @@ def load_config(config_path: str) -> Dict[str, Any]:
         print(f"Error parsing {config_path}. Please ensure it's valid JSON.")
         exit(1)
 
+@lru_cache(maxsize=8)
+def _load_config_file(config_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a configuration file, cached per path and modification time"""
+    with open(config_path, 'rb') as f:
+        return json_loads(f.read())
+
 def create_default_config(config_path: str) -> Dict[str, Any]:
     """Create default configuration file"""
-    default_config = {
-        "cluster_name": "k8s-cluster",
-        "aws_region": "us-east-1",
-        "availability_zones": ["us-east-1a", "us-east-1b"],
-        "vpc_cidr": "10.0.0.0/16",
-        "subnet_count": 2,
-        "master_count": 1,
-        "worker_count": 2,
-        "master_instance_type": "t3.medium",
-        "worker_instance_type": "t3.large",
-        "master_volume_size": 50,
-        "worker_volume_size": 100,
-        "ssh_public_key_path": "./.ssh/id_rsa.pub",
-        "ssh_private_key_path": "./.ssh/id_rsa",
-        "kubernetes_version": "1.28.2",
-        "pod_network_cidr": "10.244.0.0/16",
-        "service_cidr": "10.96.0.0/12"
-    }
-    
     # Save default configuration
-    with open(config_path, 'w') as f:
-        json.dump(default_config, f, indent=2)
+    Path(config_path).write_bytes(_DEFAULT_CONFIG_BYTES)
         
     print(f"Default configuration saved to {config_path}. Please review and modify as needed.")
-    return default_config
+    return copy.deepcopy(dict(_DEFAULT_CONFIG))
 
 def validate_config(config: Dict[str, Any]) -> bool:
     """Validate configuration parameters"""
@@ -99,6 +111,10 @@ def main():
     if not validate_config(config):
         exit(1)
     
+    # Import the manager only once arguments and config are known to be good;
+    # LangChain and the tool modules are slow to load
+    from k8s_manager import K8sClusterManager
+    
     # Initialize K8s cluster manager
     manager = K8sClusterManager(
         api_key=args.api_key,
@@ -113,7 +129,7 @@ def main():
         if result["success"]:
             print("Kubernetes cluster created successfully!")
             print("\nCluster Information:")
-            print(json.dumps(result.get("cluster_info", {}), indent=2))
+            print(json_dumps(result.get("cluster_info", {})))
         else:
             print(f"Failed to create Kubernetes cluster: {result['message']}")
     elif args.action == 'destroy':
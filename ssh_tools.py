@@ -1,12 +1,191 @@
 from langchain.tools import BaseTool
 from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain.pydantic_v1 import BaseModel, Field
 import paramiko
 import os
-from typing import Optional, Type, List, Dict, Any, Union
+import time
+import posixpath
+import atexit
+import queue
+import select
+import shlex
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, Type, List, Dict, Any, Union, Tuple, Deque, Iterator
+
+# Idle connections are kept open this long for reuse, like ssh's ControlPersist
+CONNECTION_PERSIST = 600
+KEEPALIVE_INTERVAL = 30
+# Idle connections kept per host; a handful stays well under sshd's MaxStartups
+MAX_IDLE_PER_HOST = 4
+# A larger SFTP window keeps more data in flight on high-latency links
+SFTP_WINDOW_SIZE = 64 * 1024 * 1024
+SFTP_MAX_PACKET_SIZE = 32768
+COPY_BUFFER_SIZE = 1024 * 1024
+# Concurrent SFTP sessions used for recursive transfers. Every session is a channel on
+# the same connection, and sshd's MaxSessions (10 by default) caps channels per connection
+SFTP_PARALLELISM = 4
+MAX_SFTP_SESSIONS = 6
+# Concurrent exec channels for batched commands, under the same MaxSessions cap and
+# leaving room for the pooled connection's own SFTP session
+MAX_BATCH_CHANNELS = MAX_SFTP_SESSIONS
+
+class PooledConnection:
+    """SSH connection held in the pool, with an SFTP session opened on first use"""
+    
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        self.last_used = time.monotonic()
+        self._sftp: Optional[paramiko.SFTPClient] = None
+        
+    @property
+    def sftp(self) -> paramiko.SFTPClient:
+        if self._sftp is None:
+            self._sftp = open_sftp(self.client)
+        return self._sftp
+        
+    def is_alive(self) -> bool:
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+        
+    def close(self) -> None:
+        if self._sftp is not None:
+            self._sftp.close()
+        self.client.close()
+
+def open_sftp(client: paramiko.SSHClient) -> paramiko.SFTPClient:
+    # open_sftp() takes no window arguments, so open the session on the transport directly
+    return paramiko.SFTPClient.from_transport(
+        client.get_transport(),
+        window_size=SFTP_WINDOW_SIZE,
+        max_packet_size=SFTP_MAX_PACKET_SIZE
+    )
+
+def _open_sftp_pool(client: paramiko.SSHClient, k: int) -> List[paramiko.SFTPClient]:
+    """Open k SFTP sessions sharing the client's transport, bounded by MAX_SFTP_SESSIONS"""
+    return [open_sftp(client) for _ in range(max(1, min(k, MAX_SFTP_SESSIONS)))]
+
+# Host key policy and known hosts are shared by every connection instead of rebuilt per connect
+_POLICY = paramiko.AutoAddPolicy()
+_HOST_KEYS = paramiko.HostKeys()
+_KNOWN_HOSTS_PATH = os.path.expanduser("~/.ssh/known_hosts")
+if os.path.exists(_KNOWN_HOSTS_PATH):
+    try:
+        _HOST_KEYS.load(_KNOWN_HOSTS_PATH)
+    except IOError:
+        pass
+
+_SSH_POOL: Dict[Tuple[str, str, int, str, bool], Deque[PooledConnection]] = defaultdict(deque)
+_SSH_POOL_LOCK = threading.Lock()
+
+@lru_cache(maxsize=16)
+def _load_key(path: str) -> paramiko.PKey:
+    """Parse a private key file once, so reconnecting doesn't re-read and re-derive it"""
+    for key_class in (paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey):
+        try:
+            return key_class.from_private_key_file(path)
+        except paramiko.SSHException:
+            continue
+    raise paramiko.SSHException(f"Unsupported or invalid private key: {path}")
+
+def _key_auth(key_path: str) -> Dict[str, Any]:
+    """Authentication arguments for connect, using the cached key when paramiko can load it on its own"""
+    # A certificate next to the key, a passphrase-protected key held in ssh-agent, or a
+    # missing key file all need paramiko's own key_filename handling and its fallbacks
+    if not os.path.exists(f"{key_path}-cert.pub"):
+        try:
+            return {"pkey": _load_key(key_path)}
+        except (paramiko.SSHException, OSError):
+            pass
+    return {"key_filename": key_path}
+
+def _connect(host: str, username: str, key_path: str, port: int, timeout: int, compress: bool) -> paramiko.SSHClient:
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(_POLICY)
+    # Copied rather than shared, since the policy records new hosts into the client's keys
+    client.get_host_keys().update(_HOST_KEYS)
+    client.connect(
+        hostname=host,
+        username=username,
+        port=port,
+        timeout=timeout,
+        compress=compress,
+        **_key_auth(key_path)
+    )
+    client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+    return client
+
+@contextmanager
+def borrow(host: str, username: str, key_path: str, port: int = 22, timeout: int = 30,
+           compress: bool = False) -> Iterator[PooledConnection]:
+    """Borrow a pooled SSH connection to host for exclusive use, connecting if none is idle"""
+    # Compression is negotiated per connection, so compressed and plain connections are pooled apart
+    key = (host, username, port, key_path, compress)
+    conn = None
+    stale = []
+    
+    with _SSH_POOL_LOCK:
+        idle = _SSH_POOL[key]
+        while idle:
+            candidate = idle.pop()
+            if candidate.is_alive() and time.monotonic() - candidate.last_used < CONNECTION_PERSIST:
+                conn = candidate
+                break
+            stale.append(candidate)
+            
+    for candidate in stale:
+        candidate.close()
+        
+    # Connect outside the lock so connections to different hosts don't wait on each other
+    if conn is None:
+        conn = PooledConnection(_connect(host, username, key_path, port, timeout, compress))
+        
+    try:
+        yield conn
+    finally:
+        conn.last_used = time.monotonic()
+        with _SSH_POOL_LOCK:
+            idle = _SSH_POOL[key]
+            if conn.is_alive() and len(idle) < MAX_IDLE_PER_HOST:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+def close_connections() -> None:
+    """Close every pooled SSH connection"""
+    with _SSH_POOL_LOCK:
+        conns = [conn for idle in _SSH_POOL.values() for conn in idle]
+        _SSH_POOL.clear()
+        
+    for conn in conns:
+        conn.close()
+
+atexit.register(close_connections)
+
+class SSHCommandInput(BaseModel):
+    """Arguments of the ssh_execute tool"""
+    host: str = Field(description="Hostname or IP address of the server")
+    username: str = Field("ubuntu", description="SSH user")
+    key_path: str = Field("~/.ssh/id_rsa", description="Path to the SSH private key")
+    port: int = Field(22, description="SSH port")
+    command: str = Field("echo 'Hello World'", description="Command to run")
+    timeout: int = Field(30, description="Connection timeout in seconds")
+    commands: Optional[List[str]] = Field(None, description="Independent commands to run concurrently instead of command")
+    capture: bool = Field(True, description="Return command output; when false only exit statuses are reported")
+    compress: bool = Field(False, description="Compress the connection, for large outputs over slow links")
 
 class SSHConnectionTool(BaseTool):
     name = "ssh_execute"
     description = "Execute commands on remote servers via SSH"
+    args_schema: Type[BaseModel] = SSHCommandInput
     
     def _run(self, host: str, 
              username: str = "ubuntu", 
@@ -14,35 +193,55 @@ class SSHConnectionTool(BaseTool):
              port: int = 22,
              command: str = "echo 'Hello World'",
              timeout: int = 30,
+             commands: Optional[List[str]] = None,
+             capture: bool = True,
+             compress: bool = False,
              callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Execute commands on remote servers via SSH"""
         try:
             # Expand key path if it uses ~
             key_path = os.path.expanduser(key_path)
             
-            # Create SSH client
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Connect to server
-            client.connect(
-                hostname=host,
-                username=username,
-                key_filename=key_path,
-                port=port,
-                timeout=timeout
-            )
-            
-            # Execute command
-            stdin, stdout, stderr = client.exec_command(command)
-            exit_status = stdout.channel.recv_exit_status()
-            
-            # Get command output
-            output = stdout.read().decode('utf-8')
-            error = stderr.read().decode('utf-8')
+            if commands:
+                results = self._run_batch(host, commands, username, key_path, port, timeout, compress)
+                reports = []
+                for cmd, (exit_status, output, error) in zip(commands, results):
+                    if exit_status != 0:
+                        detail = f":\n{error.decode('utf-8', errors='replace')}" if capture else ""
+                        reports.append(f"Command '{cmd}' failed with exit status {exit_status}{detail}")
+                    elif not capture:
+                        reports.append(f"Command '{cmd}' finished with exit status {exit_status}")
+                    else:
+                        reports.append(f"Command '{cmd}' executed successfully:\n{output.decode('utf-8', errors='replace')}")
+                        
+                # Lead with a failure line so a failed batch reads as a failed step
+                failed = sum(1 for exit_status, _, _ in results if exit_status != 0)
+                if failed:
+                    reports.insert(0, f"Command failed for {failed} of {len(commands)} commands")
+                return "\n".join(reports)
             
-            # Close connection
-            client.close()
+            # Borrow a pooled connection to the server, connecting if none is idle
+            with borrow(host, username, key_path, port, timeout, compress) as conn:
+                if not capture:
+                    # Only the exit status is wanted, so drain the output without keeping or decoding it
+                    chan = conn.client.get_transport().open_session()
+                    chan.set_combine_stderr(True)
+                    chan.exec_command(command)
+                    while chan.recv(65536):
+                        pass
+                    exit_status = chan.recv_exit_status()
+                    chan.close()
+                    if exit_status != 0:
+                        return f"Command failed with exit status {exit_status}"
+                    return f"Command finished with exit status {exit_status}"
+                    
+                # Execute command
+                stdin, stdout, stderr = conn.client.exec_command(command)
+                exit_status = stdout.channel.recv_exit_status()
+                
+                # Get command output
+                output = stdout.read().decode('utf-8', errors='replace')
+                error = stderr.read().decode('utf-8', errors='replace')
             
             if exit_status == 0:
                 return f"Command executed successfully:\n{output}"
@@ -50,6 +249,56 @@ class SSHConnectionTool(BaseTool):
                 return f"Command failed with exit status {exit_status}:\n{error}"
         except Exception as e:
             return f"SSH error: {str(e)}"
+    
+    def _run_batch(self, host: str,
+                   commands: List[str],
+                   username: str = "ubuntu",
+                   key_path: str = "~/.ssh/id_rsa",
+                   port: int = 22,
+                   timeout: int = 30,
+                   compress: bool = False) -> List[Tuple[int, bytes, bytes]]:
+        """Run commands concurrently on one SSH connection, returning (exit_status, stdout, stderr) for each"""
+        with borrow(host, username, os.path.expanduser(key_path), port, timeout, compress) as conn:
+            transport = conn.client.get_transport()
+            results = []
+            
+            # Channels are opened in waves of MAX_BATCH_CHANNELS so sshd never refuses a session
+            for start in range(0, len(commands), MAX_BATCH_CHANNELS):
+                results.extend(self._run_wave(transport, commands[start:start + MAX_BATCH_CHANNELS], timeout))
+            return results
+            
+    @staticmethod
+    def _run_wave(transport: paramiko.Transport, commands: List[str], timeout: int) -> List[Tuple[int, bytes, bytes]]:
+        """Run commands on concurrent channels of one transport, closing every channel it opened"""
+        channels = []
+        try:
+            # One session channel per command, all multiplexed over the same transport
+            for cmd in commands:
+                chan = transport.open_session()
+                channels.append(chan)
+                chan.exec_command(cmd)
+            
+            stdout = {chan: bytearray() for chan in channels}
+            stderr = {chan: bytearray() for chan in channels}
+            pending = set(channels)
+            
+            while pending:
+                readable, _, _ = select.select(list(pending), [], [], timeout)
+                for chan in readable:
+                    while chan.recv_ready():
+                        stdout[chan].extend(chan.recv(32768))
+                    while chan.recv_stderr_ready():
+                        stderr[chan].extend(chan.recv_stderr(32768))
+                        
+                # A channel is done once the command exited and all of its output was read
+                for chan in list(pending):
+                    if chan.exit_status_ready() and chan.eof_received and not chan.recv_ready() and not chan.recv_stderr_ready():
+                        pending.discard(chan)
+            
+            return [(chan.recv_exit_status(), bytes(stdout[chan]), bytes(stderr[chan])) for chan in channels]
+        finally:
+            for chan in channels:
+                chan.close()
 
 class SCPTransferTool(BaseTool):
     name = "scp_transfer"
@@ -64,121 +313,47 @@ class SCPTransferTool(BaseTool):
              upload: bool = True,
              recursive: bool = False,
              timeout: int = 30,
+             compress: bool = False,
              callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Transfer files to/from remote servers via SCP"""
         try:
             # Expand key path if it uses ~
             key_path = os.path.expanduser(key_path)
             
-            # Create SSH client
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Connect to server
-            client.connect(
-                hostname=host,
-                username=username,
-                key_filename=key_path,
-                port=port,
-                timeout=timeout
-            )
-            
-            # Create SFTP client
-            sftp = client.open_sftp()
-            
-            if upload:
-                if recursive and os.path.isdir(local_path):
-                    # Create remote directory if it doesn't exist
-                    try:
-                        sftp.stat(remote_path)
-                    except FileNotFoundError:
-                        sftp.mkdir(remote_path)
-                    
-                    # Upload directory recursively
-                    for root, dirs, files in os.walk(local_path):
-                        for dir_name in dirs:
-                            local_dir = os.path.join(root, dir_name)
-                            rel_path = os.path.relpath(local_dir, local_path)
-                            remote_dir = os.path.join(remote_path, rel_path)
-                            try:
-                                sftp.stat(remote_dir)
-                            except FileNotFoundError:
-                                sftp.mkdir(remote_dir)
-                        
-                        for file_name in files:
-                            local_file = os.path.join(root, file_name)
-                            rel_path = os.path.relpath(local_file, local_path)
-                            remote_file = os.path.join(remote_path, rel_path)
-                            sftp.put(local_file, remote_file)
-                    
-                    result = f"Directory {local_path} uploaded to {remote_path} on {host}"
+            # Borrow a pooled connection and reuse its SFTP session
+            with borrow(host, username, key_path, port, timeout, compress) as conn:
+                sftp = conn.sftp
+                
+                if upload:
+                    if recursive and os.path.isdir(local_path):
+                        # Upload directory recursively
+                        upload_dir_recursive(conn.client, sftp, local_path, remote_path)
+                        result = f"Directory {local_path} uploaded to {remote_path} on {host}"
+                    else:
+                        # Upload single file
+                        sftp_upload_file(sftp, local_path, remote_path)
+                        result = f"File {local_path} uploaded to {remote_path} on {host}"
                 else:
-                    # Upload single file
-                    sftp.put(local_path, remote_path)
-                    result = f"File {local_path} uploaded to {remote_path} on {host}"
-            else:
-                if recursive and sftp_is_dir(sftp, remote_path):
-                    # Create local directory if it doesn't exist
-                    if not os.path.exists(local_path):
-                        os.makedirs(local_path)
+                    if recursive and sftp_is_dir(sftp, remote_path):
+                        # Create local directory if it doesn't exist
+                        if not os.path.exists(local_path):
+                            os.makedirs(local_path)
                     
-                    # Download directory recursively
-                    download_dir_recursive(sftp, remote_path, local_path)
-                    result = f"Directory {remote_path} downloaded to {local_path} from {host}"
-                else:
-                    # Download single file
-                    sftp.get(remote_path, local_path)
-                    result = f"File {remote_path} downloaded to {local_path} from {host}"
-            
-            # Close connections
-            sftp.close()
-            client.close()
+                        # Download directory recursively, as one tar stream when the server has tar
+                        if not _fast_recursive_download(conn.client, remote_path, local_path):
+                            download_dir_recursive(conn.client, sftp, remote_path, local_path)
+                        result = f"Directory {remote_path} downloaded to {local_path} from {host}"
+                    else:
+                        # Download single file
+                        sftp_download_file(sftp, remote_path, local_path)
+                        result = f"File {remote_path} downloaded to {local_path} from {host}"
             
             return result
         except Exception as e:
             return f"SCP error: {str(e)}"
 
-class ScriptGeneratorTool(BaseTool):
-    name = "generate_script"
-    description = "Generate shell scripts for server configuration"
-    
-    def _run(self, script_type: str,
-             output_path: str,
-             parameters: Optional[Dict[str, Any]] = None,
-             callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
-        """Generate shell scripts for server configuration"""
-        try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            script_content = ""
-            
-            if script_type == "k8s_master":
-                script_content = self._generate_k8s_master_script(parameters)
-            elif script_type == "k8s_worker":
-                script_content = self._generate_k8s_worker_script(parameters)
-            elif script_type == "common":
-                script_content = self._generate_common_script(parameters)
-            else:
-                return f"Unknown script type: {script_type}"
-                
-            # Write script to file
-            with open(output_path, 'w') as f:
-                f.write(script_content)
-                
-            # Make script executable
-            os.chmod(output_path, 0o755)
-                
-            return f"Script generated at {output_path}"
-        except Exception as e:
-            return f"Script generation error: {str(e)}"
-            
-    def _generate_common_script(self, parameters: Optional[Dict[str, Any]] = None) -> str:
-        """Generate common setup script for all nodes"""
-        kubernetes_version = parameters.get("kubernetes_version", "1.28.2")
-        containerd_version = parameters.get("containerd_version", "1.7.2")
-        
-        script = f"""#!/bin/bash
+# Script templates are parsed once here and rendered with str.format
+_COMMON_SCRIPT = """#!/bin/bash
 set -e
 
 # Common setup script for Kubernetes nodes
@@ -232,14 +407,8 @@ apt-mark hold kubelet kubeadm kubectl
 
 echo "Common node setup completed!"
 """
-        return script
-        
-    def _generate_k8s_master_script(self, parameters: Optional[Dict[str, Any]] = None) -> str:
-        """Generate master node setup script"""
-        pod_network_cidr = parameters.get("pod_network_cidr", "10.244.0.0/16")
-        service_cidr = parameters.get("service_cidr", "10.96.0.0/12")
-        
-        script = f"""#!/bin/bash
+
+_MASTER_SCRIPT = """#!/bin/bash
 set -e
 
 # Master node setup script
@@ -266,13 +435,8 @@ kubectl get nodes
 
 echo "Master node setup completed!"
 """
-        return script
-        
-    def _generate_k8s_worker_script(self, parameters: Optional[Dict[str, Any]] = None) -> str:
-        """Generate worker node setup script"""
-        join_command = parameters.get("join_command", "")
-        
-        script = f"""#!/bin/bash
+
+_WORKER_SCRIPT = """#!/bin/bash
 set -e
 
 # Worker node setup script
@@ -282,7 +446,65 @@ set -e
 
 echo "Worker node joined the cluster!"
 """
-        return script
+
+# Template and default parameters for each script type
+_SCRIPT_TEMPLATES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "common": (_COMMON_SCRIPT, {"kubernetes_version": "1.28.2", "containerd_version": "1.7.2"}),
+    "k8s_master": (_MASTER_SCRIPT, {"pod_network_cidr": "10.244.0.0/16", "service_cidr": "10.96.0.0/12"}),
+    "k8s_worker": (_WORKER_SCRIPT, {"join_command": ""}),
+}
+
+@lru_cache(maxsize=64)
+def _render(script_type: str, params: Tuple[Tuple[str, Any], ...]) -> str:
+    """Render a script from its template, with params overriding the defaults"""
+    template, defaults = _SCRIPT_TEMPLATES[script_type]
+    return template.format(**{**defaults, **dict(params)})
+
+class ScriptGeneratorTool(BaseTool):
+    name = "generate_script"
+    description = "Generate shell scripts for server configuration"
+    
+    def _run(self, script_type: str,
+             output_path: str,
+             parameters: Optional[Dict[str, Any]] = None,
+             callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        """Generate shell scripts for server configuration"""
+        try:
+            if script_type not in _SCRIPT_TEMPLATES:
+                return f"Unknown script type: {script_type}"
+                
+            # Create directory if it doesn't exist
+            output_dir = os.path.dirname(output_path) or "."
+            os.makedirs(output_dir, exist_ok=True)
+            
+            # Rendered scripts are cached per parameter set, unless a value can't be hashed
+            params = tuple(sorted((parameters or {}).items()))
+            try:
+                script_content = _render(script_type, params)
+            except TypeError:
+                script_content = _render.__wrapped__(script_type, params)
+                
+            # Write to a temporary file and rename it over output_path. Workers configured in
+            # parallel regenerate the same script, and truncating it in place could hand a
+            # concurrent upload an empty or partial file; readers keep the old file until done
+            data = script_content.encode('utf-8')
+            fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=f".{os.path.basename(output_path)}.")
+            try:
+                try:
+                    written = 0
+                    while written < len(data):
+                        written += os.write(fd, data[written:])
+                    os.fchmod(fd, 0o755)
+                finally:
+                    os.close(fd)
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+                
+            return f"Script generated at {output_path}"
+        except Exception as e:
+            return f"Script generation error: {str(e)}"
 
 # Helper functions for SCP
 def sftp_is_dir(sftp, path):
@@ -291,14 +513,142 @@ def sftp_is_dir(sftp, path):
     except:
         return False
 
-def download_dir_recursive(sftp, remote_dir, local_dir):
-    for item in sftp.listdir(remote_dir):
-        remote_path = os.path.join(remote_dir, item)
-        local_path = os.path.join(local_dir, item)
+def list_remote_files(sftp, remote_dir, local_dir):
+    """Create the local directory tree for remote_dir and return its (remote, local) file pairs"""
+    pairs = []
+    # listdir_attr returns each entry's mode with the listing, so no per-entry stat is needed
+    for attr in sftp.listdir_attr(remote_dir):
+        remote_path = os.path.join(remote_dir, attr.filename)
+        local_path = os.path.join(local_dir, attr.filename)
         
-        if sftp_is_dir(sftp, remote_path):
+        if stat.S_ISDIR(attr.st_mode):
             if not os.path.exists(local_path):
                 os.makedirs(local_path)
-            download_dir_recursive(sftp, remote_path, local_path)
+            pairs.extend(list_remote_files(sftp, remote_path, local_path))
+        else:
+            pairs.append((remote_path, local_path))
+    return pairs
+
+def _fast_recursive_download(client, remote_dir, local_dir):
+    """Download remote_dir as a single tar stream over one channel, returning False if that failed"""
+    stdin, stdout, stderr = client.exec_command(f"tar -C {shlex.quote(remote_dir)} -cf - .")
+    try:
+        with tarfile.open(fileobj=stdout, mode='r|') as archive:
+            # Refuse absolute paths, links out of local_dir and device files where tarfile supports it
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(local_dir, filter='data')
+            else:
+                archive.extractall(local_dir)
+    except tarfile.TarError:
+        stdout.channel.close()
+        return False
+    return stdout.channel.recv_exit_status() == 0
+
+def download_dir_recursive(client, sftp, remote_dir, local_dir):
+    transfer_parallel(client, list_remote_files(sftp, remote_dir, local_dir), sftp_download_file)
+
+def upload_dir_recursive(client, sftp, local_dir, remote_dir):
+    pairs = []
+    remote_dirs = [remote_dir.rstrip('/') or '/']
+    for local_path, remote_path, is_dir in _walk_pairs(local_dir, remote_dir):
+        if is_dir:
+            remote_dirs.append(remote_path)
         else:
-            sftp.get(remote_path, local_path)
\ No newline at end of file
+            pairs.append((local_path, remote_path))
+    
+    # Create the remote directories serially, parents first, so the parallel uploads never race on mkdir
+    created = set()
+    new_dirs = {path for path in remote_dirs if ensure_remote_dir(sftp, path, created)}
+    
+    # Skip files whose size and mtime already match the remote copy, listing each directory once
+    listings = {}
+    changed = []
+    for local_path, remote_path in pairs:
+        parent, name = posixpath.split(remote_path)
+        if parent not in listings:
+            listings[parent] = {} if parent in new_dirs else _remote_listing(sftp, parent)
+        st = os.stat(local_path)
+        if listings[parent].get(name) != (st.st_size, int(st.st_mtime)):
+            changed.append((local_path, remote_path))
+    
+    transfer_parallel(client, changed, _upload_preserving_mtime)
+
+def _remote_listing(sftp, remote_dir):
+    """Map each entry of remote_dir to its (size, mtime)"""
+    try:
+        return {attr.filename: (attr.st_size, attr.st_mtime) for attr in sftp.listdir_attr(remote_dir)}
+    except FileNotFoundError:
+        return {}
+
+def _upload_preserving_mtime(sftp, local_path, remote_path):
+    # Keep the local mtime on the remote copy so the next upload can tell it is unchanged
+    sftp_upload_file(sftp, local_path, remote_path)
+    st = os.stat(local_path)
+    sftp.utime(remote_path, (st.st_atime, st.st_mtime))
+
+def _walk_pairs(local_root, remote_root):
+    """Yield (local_path, remote_path, is_dir) for everything under local_root, parents before children"""
+    stack = [(local_root, remote_root.rstrip('/'))]
+    while stack:
+        local_dir, remote_dir = stack.pop()
+        with os.scandir(local_dir) as entries:
+            for entry in entries:
+                # Remote paths are always POSIX, whatever the local platform
+                remote_path = f"{remote_dir}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, remote_path))
+                    yield entry.path, remote_path, True
+                elif entry.is_dir():
+                    # Like os.walk, create symlinked directories without descending into them
+                    yield entry.path, remote_path, True
+                else:
+                    yield entry.path, remote_path, False
+
+def ensure_remote_dir(sftp, remote_dir, created):
+    """Create remote_dir if it is missing, returning True if it was made; directories in created are skipped"""
+    if remote_dir in created:
+        return False
+    made = False
+    try:
+        sftp.stat(remote_dir)
+    except FileNotFoundError:
+        sftp.mkdir(remote_dir)
+        made = True
+    created.add(remote_dir)
+    return made
+
+def transfer_parallel(client, pairs, transfer, workers=SFTP_PARALLELISM):
+    """Run transfer(sftp, src, dst) for each pair across several SFTP sessions on one connection"""
+    if not pairs:
+        return
+    
+    sessions = _open_sftp_pool(client, min(workers, len(pairs)))
+    handles = queue.Queue()
+    for session in sessions:
+        handles.put(session)
+    
+    def _transfer(pair):
+        sftp = handles.get()
+        try:
+            transfer(sftp, *pair)
+        finally:
+            handles.put(sftp)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+            # Consume the results so the first failed transfer is raised
+            list(executor.map(_transfer, pairs))
+    finally:
+        for session in sessions:
+            session.close()
+
+def sftp_upload_file(sftp, local_path, remote_path):
+    # putfo pipelines the writes instead of waiting for each ACK
+    with open(local_path, 'rb') as local_f:
+        sftp.putfo(local_f, remote_path, file_size=os.fstat(local_f.fileno()).st_size)
+
+def sftp_download_file(sftp, remote_path, local_path):
+    with sftp.open(remote_path, 'rb') as remote_f, open(local_path, 'wb') as local_f:
+        # Request all blocks up front rather than one read round trip at a time
+        remote_f.prefetch(remote_f.stat().st_size)
+        shutil.copyfileobj(remote_f, local_f, length=COPY_BUFFER_SIZE)
@@ -2,8 +2,132 @@ from langchain.tools import BaseTool
 from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
 import subprocess
 import os
+import re
 import json
-from typing import Optional, Type, List, Dict, Any, Union
+import asyncio
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Type, List, Dict, Any, Union, Tuple, Callable, Awaitable, Iterator
+
+from json_utils import json_loads, json_dumps
+
+# Most of a command's output handed back to the agent; the full log goes to disk
+OUTPUT_TAIL_BYTES = 64 * 1024
+OUTPUT_TAIL_LINES = 2000
+# Terraform logs are rotated once they grow past this size
+LOG_MAX_BYTES = 10 * 1024 * 1024
+# Longest single output line the async stream reader accepts
+STREAM_LINE_LIMIT = 1024 * 1024
+
+# Providers are downloaded once into this cache instead of on every terraform init
+TERRAFORM_PLUGIN_CACHE_DIR = os.path.expanduser("~/.terraform.d/plugin-cache")
+# Concurrent resource operations per plan/apply/destroy. This bounds provider API calls
+# rather than CPU work, so it never drops below Terraform's own default of 10
+TERRAFORM_PARALLELISM = max(10, (os.cpu_count() or 4) * 2)
+
+def _terraform_env() -> Dict[str, str]:
+    """Environment for terraform subprocesses; values already set by the user take precedence"""
+    env = {"TF_PLUGIN_CACHE_DIR": TERRAFORM_PLUGIN_CACHE_DIR}
+    for command in ("plan", "apply", "destroy"):
+        env[f"TF_CLI_ARGS_{command}"] = f"-parallelism={TERRAFORM_PARALLELISM}"
+    env.update(os.environ)
+    return env
+
+def _log_path(workspace_dir: str) -> str:
+    """Terraform log file, one per workspace so concurrent workspaces don't share or rotate it"""
+    return os.path.join(os.path.abspath(workspace_dir), "terraform.log")
+
+class _OutputTail:
+    """Last OUTPUT_TAIL_LINES lines of a command's output, capped at OUTPUT_TAIL_BYTES"""
+    
+    def __init__(self):
+        self.lines = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.size = 0
+        
+    def append(self, line: str) -> None:
+        if len(self.lines) == self.lines.maxlen:
+            self.size -= len(self.lines[0])
+        self.lines.append(line)
+        self.size += len(line)
+        while self.size > OUTPUT_TAIL_BYTES and len(self.lines) > 1:
+            self.size -= len(self.lines.popleft())
+            
+    def text(self) -> str:
+        return "".join(self.lines)
+
+def _rotate_log(log_path: str) -> None:
+    if os.path.exists(log_path) and os.path.getsize(log_path) > LOG_MAX_BYTES:
+        os.replace(log_path, f"{log_path}.1")
+
+def _stream_command(cmd: List[str], log_path: str, cwd: str,
+                    on_line: Optional[Callable[[str], Any]] = None) -> Tuple[int, str]:
+    """Run a command in cwd, streaming its combined output to a log file and keeping only the tail in memory"""
+    _rotate_log(log_path)
+    
+    tail = _OutputTail()
+    with open(log_path, "a", encoding="utf-8", buffering=1) as log, \
+            subprocess.Popen(cmd, cwd=cwd, env=_terraform_env(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8", errors="replace", bufsize=1) as proc:
+        for line in proc.stdout:
+            log.write(line)
+            tail.append(line)
+            if on_line is not None:
+                on_line(line)
+                
+    return proc.returncode, tail.text()
+
+async def _astream_command(cmd: List[str], log_path: str, cwd: str,
+                           on_line: Optional[Callable[[str], Awaitable[Any]]] = None) -> Tuple[int, str]:
+    """Async version of _stream_command, running the command in cwd"""
+    _rotate_log(log_path)
+    
+    tail = _OutputTail()
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, cwd=os.path.abspath(cwd), env=_terraform_env(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=STREAM_LINE_LIMIT
+    )
+    try:
+        with open(log_path, "a", encoding="utf-8", buffering=1) as log:
+            async for raw in proc.stdout:
+                line = raw.decode("utf-8", errors="replace")
+                log.write(line)
+                tail.append(line)
+                if on_line is not None:
+                    await on_line(line)
+                    
+        return await proc.wait(), tail.text()
+    finally:
+        # A cancelled task must not leave terraform running with the state lock held
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+async def _arun_command(cmd: List[str], cwd: str) -> Tuple[int, str, str]:
+    """Run a command in cwd without blocking the event loop, returning (returncode, stdout, stderr)"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, cwd=os.path.abspath(cwd), env=_terraform_env(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return proc.returncode, stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+
+@contextmanager
+def _var_file_args(variables: Optional[Dict[str, Any]]) -> Iterator[List[str]]:
+    """Write variables to a temporary .tfvars.json and yield the -var-file argument for it"""
+    if not variables:
+        yield []
+        return
+        
+    # One var file keeps argv short and is parsed once, unlike a -var flag per variable
+    with tempfile.NamedTemporaryFile("w", suffix=".tfvars.json", delete=False) as f:
+        json.dump(variables, f, default=str)
+    try:
+        yield [f"-var-file={f.name}"]
+    finally:
+        os.remove(f.name)
 
 class TerraformInitTool(BaseTool):
     name = "terraform_init"
@@ -13,156 +137,317 @@ class TerraformInitTool(BaseTool):
              callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Run terraform init in the specified directory"""
         try:
-            os.chdir(workspace_dir)
-            result = subprocess.run(["terraform", "init"], 
+            result = subprocess.run(["terraform", "init"], cwd=os.path.abspath(workspace_dir), env=_terraform_env(),
                                    capture_output=True, text=True, check=True)
             return f"Terraform initialization complete:\n{result.stdout}"
         except subprocess.CalledProcessError as e:
             return f"Error initializing Terraform: {e.stderr}"
-        finally:
-            os.chdir("..")
+            
+    async def _arun(self, workspace_dir: str = "./terraform",
+                    callback_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        """Run terraform init in the specified directory without blocking the event loop"""
+        returncode, stdout, stderr = await _arun_command(["terraform", "init"], workspace_dir)
+        if returncode == 0:
+            return f"Terraform initialization complete:\n{stdout}"
+        return f"Error initializing Terraform: {stderr}"
 
 class TerraformPlanTool(BaseTool):
     name = "terraform_plan"
     description = "Generate and show Terraform execution plan"
     
+    def _command(self, var_args: List[str]) -> List[str]:
+        return ["terraform", "plan", "-detailed-exitcode", "-out=tfplan"] + var_args
+    
+    def _result(self, returncode: int, output: str) -> str:
+        if returncode == 0:
+            return "Terraform plan shows no changes needed"
+        elif returncode == 2:
+            return f"Terraform plan generated with changes:\n{output}"
+        else:
+            return f"Error in Terraform plan: {output}"
+    
     def _run(self, workspace_dir: str = "./terraform", 
              variables: Optional[Dict[str, Any]] = None,
-             callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+             run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Run terraform plan with optional variables"""
         try:
-            os.chdir(workspace_dir)
-            cmd = ["terraform", "plan", "-detailed-exitcode", "-out=tfplan"]
-            
-            # Add variables if provided
-            if variables:
-                var_args = []
-                for key, value in variables.items():
-                    var_args.extend(["-var", f"{key}={value}"])
-                cmd.extend(var_args)
-                
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            workspace_dir = os.path.abspath(workspace_dir)
+            on_line = run_manager.on_text if run_manager else None
             
-            if result.returncode == 0:
-                return "Terraform plan shows no changes needed"
-            elif result.returncode == 2:
-                return f"Terraform plan generated with changes:\n{result.stdout}"
-            else:
-                return f"Error in Terraform plan: {result.stderr}"
+            # Stream the plan output as it is produced instead of buffering all of it
+            with _var_file_args(variables) as var_args:
+                return self._result(*_stream_command(self._command(var_args), _log_path(workspace_dir), workspace_dir, on_line))
+        except Exception as e:
+            return f"Error executing Terraform plan: {str(e)}"
+            
+    async def _arun(self, workspace_dir: str = "./terraform",
+                    variables: Optional[Dict[str, Any]] = None,
+                    run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        """Run terraform plan with optional variables without blocking the event loop"""
+        try:
+            on_line = run_manager.on_text if run_manager else None
+            with _var_file_args(variables) as var_args:
+                return self._result(*await _astream_command(self._command(var_args), _log_path(workspace_dir), workspace_dir, on_line))
         except Exception as e:
             return f"Error executing Terraform plan: {str(e)}"
-        finally:
-            os.chdir("..")
+
+class _ApplyJsonStream:
+    """Collects the outputs message from a terraform apply -json stream"""
+    
+    def __init__(self):
+        self.outputs: Optional[Dict[str, Any]] = None
+        
+    def feed(self, line: str) -> str:
+        """Record outputs from one streamed line and return its human-readable message"""
+        try:
+            message = json_loads(line)
+        except json.JSONDecodeError:
+            return line
+        if not isinstance(message, dict):
+            return line
+        if message.get("type") == "outputs":
+            self.outputs = message.get("outputs", {})
+        text = message.get("@message", "")
+        detail = (message.get("diagnostic") or {}).get("detail")
+        if detail:
+            text = f"{text}\n{detail}"
+        return f"{text}\n"
+        
+    def messages(self, output: str) -> str:
+        """Human-readable text for a tail of -json output"""
+        return "".join(self.feed(line) for line in output.splitlines(keepends=True))
 
 class TerraformApplyTool(BaseTool):
     name = "terraform_apply"
     description = "Apply Terraform plan to create/modify infrastructure"
     
+    def _command(self, auto_approve: bool, plan_file: Optional[str], var_args: List[str], refresh: bool = True) -> List[str]:
+        cmd = ["terraform", "apply"]
+        
+        if auto_approve:
+            cmd.append("-auto-approve")
+            
+        # A saved plan is never refreshed again, so the flag only matters without one
+        if not refresh and not plan_file:
+            cmd.append("-refresh=false")
+            
+        # Machine-readable output carries the outputs, saving a separate terraform output run.
+        # Terraform only allows -json for non-interactive applies
+        if auto_approve or plan_file:
+            cmd.append("-json")
+            
+        if plan_file:
+            cmd.append(plan_file)
+        else:
+            # Variables only apply when no plan file is specified
+            cmd.extend(var_args)
+        return cmd
+    
+    def _outputs_result(self, returncode: int, stdout: str, stderr: str) -> str:
+        # Parse outputs from Terraform
+        if returncode == 0:
+            try:
+                outputs = json_loads(stdout)
+                formatted_outputs = json_dumps(outputs)
+                return f"Terraform apply successful. Outputs:\n{formatted_outputs}"
+            except json.JSONDecodeError:
+                return f"Terraform apply successful. No outputs or error parsing outputs."
+        else:
+            return f"Terraform apply successful, but error fetching outputs: {stderr}"
+    
     def _run(self, workspace_dir: str = "./terraform", 
              auto_approve: bool = False,
              plan_file: Optional[str] = "tfplan",
              variables: Optional[Dict[str, Any]] = None,
-             callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+             refresh: bool = True,
+             run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Apply Terraform plan to create infrastructure"""
         try:
-            os.chdir(workspace_dir)
-            cmd = ["terraform", "apply"]
+            workspace_dir = os.path.abspath(workspace_dir)
+            stream = _ApplyJsonStream()
             
-            if auto_approve:
-                cmd.append("-auto-approve")
-                
-            if plan_file:
-                cmd.append(plan_file)
-            
-            # Add variables if provided and no plan file specified
-            if variables and not plan_file:
-                var_args = []
-                for key, value in variables.items():
-                    var_args.extend(["-var", f"{key}={value}"])
-                cmd.extend(var_args)
-                
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            def on_line(line: str) -> None:
+                message = stream.feed(line)
+                if run_manager:
+                    run_manager.on_text(message)
             
-            if result.returncode == 0:
-                # Parse outputs from Terraform
-                outputs_cmd = subprocess.run(["terraform", "output", "-json"], 
+            # Stream the apply log instead of buffering it, it can run for many minutes
+            with _var_file_args(None if plan_file else variables) as var_args:
+                cmd = self._command(auto_approve, plan_file, var_args, refresh)
+                returncode, output = _stream_command(cmd, _log_path(workspace_dir), workspace_dir, on_line)
+            
+            if returncode == 0:
+                if stream.outputs is not None:
+                    return f"Terraform apply successful. Outputs:\n{json_dumps(stream.outputs)}"
+                # Older Terraform versions or applies without outputs don't stream an outputs message
+                outputs_cmd = subprocess.run(["terraform", "output", "-json"], cwd=workspace_dir, env=_terraform_env(),
                                            capture_output=True, text=True)
-                if outputs_cmd.returncode == 0:
-                    try:
-                        outputs = json.loads(outputs_cmd.stdout)
-                        formatted_outputs = json.dumps(outputs, indent=2)
-                        return f"Terraform apply successful. Outputs:\n{formatted_outputs}"
-                    except json.JSONDecodeError:
-                        return f"Terraform apply successful. No outputs or error parsing outputs."
-                else:
-                    return f"Terraform apply successful, but error fetching outputs: {outputs_cmd.stderr}"
+                return self._outputs_result(outputs_cmd.returncode, outputs_cmd.stdout, outputs_cmd.stderr)
+            else:
+                return f"Error in Terraform apply: {stream.messages(output)}"
+        except Exception as e:
+            return f"Error executing Terraform apply: {str(e)}"
+            
+    async def _arun(self, workspace_dir: str = "./terraform",
+                    auto_approve: bool = False,
+                    plan_file: Optional[str] = "tfplan",
+                    variables: Optional[Dict[str, Any]] = None,
+                    refresh: bool = True,
+                    run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        """Apply Terraform plan to create infrastructure without blocking the event loop"""
+        try:
+            stream = _ApplyJsonStream()
+            
+            async def on_line(line: str) -> None:
+                message = stream.feed(line)
+                if run_manager:
+                    await run_manager.on_text(message)
+            
+            with _var_file_args(None if plan_file else variables) as var_args:
+                cmd = self._command(auto_approve, plan_file, var_args, refresh)
+                returncode, output = await _astream_command(cmd, _log_path(workspace_dir), workspace_dir, on_line)
+            
+            if returncode == 0:
+                if stream.outputs is not None:
+                    return f"Terraform apply successful. Outputs:\n{json_dumps(stream.outputs)}"
+                return self._outputs_result(*await _arun_command(["terraform", "output", "-json"], workspace_dir))
             else:
-                return f"Error in Terraform apply: {result.stderr}"
+                return f"Error in Terraform apply: {stream.messages(output)}"
         except Exception as e:
             return f"Error executing Terraform apply: {str(e)}"
-        finally:
-            os.chdir("..")
             
 class TerraformOutputTool(BaseTool):
     name = "terraform_output"
     description = "Get outputs from Terraform state"
     
+    def _command(self, output_name: Optional[str]) -> List[str]:
+        cmd = ["terraform", "output", "-json"]
+        
+        if output_name:
+            cmd.append(output_name)
+        return cmd
+    
+    def _result(self, returncode: int, stdout: str, stderr: str) -> str:
+        if returncode == 0:
+            try:
+                outputs = json_loads(stdout)
+                return json_dumps(outputs)
+            except json.JSONDecodeError:
+                return f"Error parsing Terraform outputs: {stdout}"
+        else:
+            return f"Error getting Terraform outputs: {stderr}"
+    
     def _run(self, workspace_dir: str = "./terraform", 
              output_name: Optional[str] = None,
              callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Get outputs from Terraform state"""
         try:
-            os.chdir(workspace_dir)
-            cmd = ["terraform", "output", "-json"]
-            
-            if output_name:
-                cmd.append(output_name)
-                
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = subprocess.run(self._command(output_name), cwd=os.path.abspath(workspace_dir), env=_terraform_env(), capture_output=True, text=True)
+            return self._result(result.returncode, result.stdout, result.stderr)
+        except Exception as e:
+            return f"Error executing Terraform output command: {str(e)}"
             
-            if result.returncode == 0:
-                try:
-                    outputs = json.loads(result.stdout)
-                    return json.dumps(outputs, indent=2)
-                except json.JSONDecodeError:
-                    return f"Error parsing Terraform outputs: {result.stdout}"
-            else:
-                return f"Error getting Terraform outputs: {result.stderr}"
+    async def _arun(self, workspace_dir: str = "./terraform",
+                    output_name: Optional[str] = None,
+                    callback_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        """Get outputs from Terraform state without blocking the event loop"""
+        try:
+            return self._result(*await _arun_command(self._command(output_name), workspace_dir))
         except Exception as e:
             return f"Error executing Terraform output command: {str(e)}"
-        finally:
-            os.chdir("..")
 
 class TerraformDestroyTool(BaseTool):
     name = "terraform_destroy"
     description = "Destroy Terraform-managed infrastructure"
     
+    def _command(self, auto_approve: bool, var_args: List[str]) -> List[str]:
+        cmd = ["terraform", "destroy"]
+        
+        if auto_approve:
+            cmd.append("-auto-approve")
+            
+        # Add variables if provided
+        return cmd + var_args
+    
+    def _result(self, returncode: int, stdout: str, stderr: str) -> str:
+        if returncode == 0:
+            return "Terraform destroy completed successfully"
+        else:
+            return f"Error in Terraform destroy: {stderr}"
+    
     def _run(self, workspace_dir: str = "./terraform", 
              auto_approve: bool = False,
              variables: Optional[Dict[str, Any]] = None,
              callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """Destroy Terraform-managed infrastructure"""
         try:
-            os.chdir(workspace_dir)
-            cmd = ["terraform", "destroy"]
+            with _var_file_args(variables) as var_args:
+                result = subprocess.run(self._command(auto_approve, var_args), cwd=os.path.abspath(workspace_dir), env=_terraform_env(), capture_output=True, text=True)
+            return self._result(result.returncode, result.stdout, result.stderr)
+        except Exception as e:
+            return f"Error executing Terraform destroy: {str(e)}"
             
-            if auto_approve:
-                cmd.append("-auto-approve")
-                
-            # Add variables if provided
-            if variables:
-                var_args = []
-                for key, value in variables.items():
-                    var_args.extend(["-var", f"{key}={value}"])
-                cmd.extend(var_args)
-                
+    async def _arun(self, workspace_dir: str = "./terraform",
+                    auto_approve: bool = False,
+                    variables: Optional[Dict[str, Any]] = None,
+                    callback_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        """Destroy Terraform-managed infrastructure without blocking the event loop"""
+        try:
+            with _var_file_args(variables) as var_args:
+                return self._result(*await _arun_command(self._command(auto_approve, var_args), workspace_dir))
+        except Exception as e:
+            return f"Error executing Terraform destroy: {str(e)}"
+
+def _node_name_pattern(cluster_name: str) -> "re.Pattern[str]":
+    """Match the Name tags main.tf gives this cluster's nodes, e.g. "k8s-cluster-worker-2" """
+    return re.compile(rf"{re.escape(cluster_name)}-(master|worker)-(\d+)")
+
+class BatchedAWSOutputTool(BaseTool):
+    name = "aws_cluster_outputs"
+    description = "Get master and worker node IP addresses from AWS with a single describe-instances call"
+    
+    def _run(self, cluster_name: str = "k8s-cluster",
+             aws_region: str = "us-east-1",
+             callback_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        """Get node IPs for every cluster instance in one API call, in the same shape as terraform output -json"""
+        try:
+            cmd = [
+                "aws", "ec2", "describe-instances",
+                "--region", aws_region,
+                "--filters",
+                # A bare "{cluster_name}-*" would also match clusters whose names extend this one
+                f"Name=tag:Name,Values={cluster_name}-master-*,{cluster_name}-worker-*",
+                # Pending instances may not have a public address yet
+                "Name=instance-state-name,Values=running",
+                "--output", "json"
+            ]
             result = subprocess.run(cmd, capture_output=True, text=True)
             
-            if result.returncode == 0:
-                return "Terraform destroy completed successfully"
-            else:
-                return f"Error in Terraform destroy: {result.stderr}"
+            if result.returncode != 0:
+                return f"Error describing cluster instances: {result.stderr}"
+                
+            nodes = {"master": [], "worker": []}
+            name_pattern = _node_name_pattern(cluster_name)
+            for reservation in json_loads(result.stdout).get("Reservations", []):
+                for instance in reservation.get("Instances", []):
+                    tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+                    # The wildcard still matches a cluster named e.g. "<cluster_name>-master",
+                    # so require the exact name shape as well
+                    match = name_pattern.fullmatch(tags.get("Name", ""))
+                    if match and tags.get("Role") == match.group(1) and instance.get("PublicIpAddress"):
+                        nodes[match.group(1)].append((int(match.group(2)), instance))
+                        
+            outputs = {}
+            for role, instances in nodes.items():
+                instances.sort(key=lambda item: item[0])
+                outputs[f"{role}_public_ips"] = {"value": [instance.get("PublicIpAddress") for _, instance in instances]}
+                outputs[f"{role}_private_ips"] = {"value": [instance.get("PrivateIpAddress") for _, instance in instances]}
+                
+            if outputs["master_public_ips"]["value"]:
+                outputs["kubernetes_api_endpoint"] = {"value": f"https://{outputs['master_public_ips']['value'][0]}:6443"}
+                
+            return json_dumps(outputs)
+        except json.JSONDecodeError:
+            return f"Error parsing AWS describe-instances output: {result.stdout}"
         except Exception as e:
-            return f"Error executing Terraform destroy: {str(e)}"
-        finally:
-            os.chdir("..")
\ No newline at end of file
+            return f"Error executing AWS describe-instances: {str(e)}"